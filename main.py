@@ -1,11 +1,14 @@
 from pathlib import Path
 import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-import json
+from src.report_io import load_report
 from src.cleaning.format_reports import clean_credit_reports
-from src.analysis.analyze_dpd import analyze_customer_dpd, write_to_csv as write_dpd_csv
-from src.analysis.analyze_disbursed_amount import analyze_customer_disbursements, write_to_csv as write_disbursement_csv
-from src.analysis.analyze_max_dpd_months import analyze_customer_max_dpd_months, write_to_csv as write_max_dpd_csv
+from src.analysis.analyze_all import ANALYSIS_KEYS, analyze_all
+from src.analysis.analyze_dpd import DpdCsvWriter
+from src.analysis.analyze_disbursed_amount import DisbursementCsvWriter
+from src.analysis.analyze_max_dpd_months import MaxDpdCsvWriter
 
 def setup_logging():
     """Configure logging with timestamp and proper formatting"""
@@ -38,52 +41,79 @@ def setup_directory_structure():
     return directories
 
 
+def analyze_report(report_file):
+    """Read a single formatted report and run every analysis on it"""
+    try:
+        # Extract customer ID from filename
+        customer_id = report_file.name.split('_')[1].split('.')[0]
+        
+        # Read the formatted report once for all analyses
+        data = load_report(report_file)
+        
+    except Exception as e:
+        # Without the report no analysis can run
+        return None, {}, {key: str(e) for key in ANALYSIS_KEYS}
+    
+    stats, errors = analyze_all(data)
+    return customer_id, stats, errors
+
 def run_analysis(formatted_reports, results_dir, logger):
     """Run various analyses on the formatted reports"""
+    # CSV writer and key of its stats in the combined analyze_all result
     analyses = {
-        'dpd': {
-            'analyze': analyze_customer_dpd,
-            'write': write_dpd_csv
-        },
-        'max_dpd_months': {
-            'analyze': analyze_customer_max_dpd_months,
-            'write': write_max_dpd_csv
-        },
-        'disbursements': {
-            'analyze': analyze_customer_disbursements,
-            'write': write_disbursement_csv
-        }
+        'dpd': (DpdCsvWriter, 'dpd'),
+        'max_dpd_months': (MaxDpdCsvWriter, 'max_dpd'),
+        'disbursements': (DisbursementCsvWriter, 'disbursements')
     }
     
-    for analysis_name, analysis_funcs in analyses.items():
+    # Open every writer up front so each result is written as soon as it arrives
+    writers = {}
+    for analysis_name, (writer_cls, stats_key) in analyses.items():
         try:
-            results = []
-            for report_file in formatted_reports:
-                try:
-                    # Extract customer ID from filename
-                    customer_id = report_file.name.split('_')[1].split('.')[0]
-                    
-                    # Read the formatted report
-                    with open(report_file, 'r') as f:
-                        data = json.load(f)
-                    
-                    # Analyze the report
-                    stats = analysis_funcs['analyze'](data)
-                    
-                    results.append({
-                        'customer_id': customer_id,
-                        'stats': stats
-                    })
-                    
-                    logger.info(f"Analyzed {report_file.name} successfully")
-                    
-                except Exception as e:
-                    logger.error(f"Error analyzing {report_file}: {str(e)}")
-            
-            # Write results
             output_dir = Path(results_dir) / f"{analysis_name}_analysis"
-            analysis_funcs['write'](results, output_dir)
-            
+            writers[analysis_name] = (writer_cls(output_dir), stats_key)
+        except Exception as e:
+            logger.error(f"Error in {analysis_name} analysis: {str(e)}")
+    
+    # Batch files per worker task to amortize inter-process overhead
+    workers = os.cpu_count() or 1
+    chunksize = max(1, len(formatted_reports) // (4 * workers))
+    
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            outcomes = executor.map(analyze_report, formatted_reports, chunksize=chunksize)
+            for report_file, (customer_id, stats, errors) in zip(formatted_reports, outcomes):
+                # Log each failed analysis; the customer is only left out of those
+                for _, stats_key in analyses.values():
+                    if stats_key in errors:
+                        logger.error(f"Error analyzing {report_file}: {errors[stats_key]}")
+                
+                for analysis_name, (writer, stats_key) in list(writers.items()):
+                    if stats_key in errors:
+                        continue
+                    try:
+                        writer.write({
+                            'customer_id': customer_id,
+                            'stats': stats[stats_key]
+                        })
+                    except Exception as e:
+                        # Drop the failing analysis, the others keep going
+                        logger.error(f"Error in {analysis_name} analysis: {str(e)}")
+                        writer.close(finalize=False)
+                        del writers[analysis_name]
+                
+                if not errors:
+                    logger.info(f"Analyzed {report_file.name} successfully")
+    
+    except Exception:
+        for writer, _ in writers.values():
+            writer.close(finalize=False)
+        raise
+    
+    # Write the overall statistics of every analysis that completed
+    for analysis_name, (writer, _) in writers.items():
+        try:
+            writer.close()
         except Exception as e:
             logger.error(f"Error in {analysis_name} analysis: {str(e)}")
 
@@ -0,0 +1,35 @@
+from src.analysis.analyze_dpd import has_30plus_dpd, analyze_customer_dpd
+from src.analysis.analyze_max_dpd_months import analyze_customer_max_dpd_months
+from src.analysis.analyze_disbursed_amount import analyze_customer_disbursements
+
+# Keys of the combined results returned by analyze_all
+ANALYSIS_KEYS = ('dpd', 'max_dpd', 'disbursements')
+
+def analyze_all(data):
+    """Run the DPD, max DPD months and disbursement analyses, scanning each payment history once.
+    
+    Returns the stats of every analysis that succeeded and the error message of every one that
+    failed, keyed by ANALYSIS_KEYS, so one failing analysis does not take the others down.
+    """
+    stats = {}
+    errors = {}
+    
+    try:
+        # Collect the 30+ DPD months once and share them between both DPD analyses
+        dpd_months_by_loan = [has_30plus_dpd(loan) for loan in data['loans']]
+    except Exception as e:
+        errors['dpd'] = errors['max_dpd'] = str(e)
+    else:
+        for key, analyze in (('dpd', analyze_customer_dpd), ('max_dpd', analyze_customer_max_dpd_months)):
+            try:
+                stats[key] = analyze(data, dpd_months_by_loan)
+            except Exception as e:
+                errors[key] = str(e)
+    
+    # Disbursements never read the payment history, so they run regardless of the DPD pass
+    try:
+        stats['disbursements'] = analyze_customer_disbursements(data)
+    except Exception as e:
+        errors['disbursements'] = str(e)
+    
+    return stats, errors
@@ -1,14 +1,26 @@
 from pathlib import Path
-import json
-import csv
+from functools import lru_cache
+import math
+import re
+import sys
+
+if __name__ == "__main__":
+    # Run directly as a script: make the repository root importable for the src.* imports below
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from src.report_io import iter_results
+from src.analysis.csv_writer import AnalysisCsvWriter
+
+# Characters stripped from amount strings before parsing
+CURRENCY_CHARS_RE = re.compile(r'[,₹\s]')
 
 def parse_amount(amount_str):
     """Convert amount string to numeric value"""
     if not amount_str:
         return 0
     
-    # Remove commas and currency symbols, convert to float
-    cleaned = amount_str.replace(',', '').replace('₹', '').strip()
+    # Remove commas, currency symbols and whitespace, convert to float
+    cleaned = CURRENCY_CHARS_RE.sub('', amount_str)
     try:
         return float(cleaned)
     except ValueError:
@@ -37,92 +49,75 @@ def analyze_customer_disbursements(data):
         'loan_details': loan_details
     }
 
+@lru_cache(maxsize=8192)
+def format_signed_amount(amount, sign):
+    """Format amount with commas and currency symbol, caching repeated amounts by value and sign"""
+    return f"₹{amount:,.2f}"
+
 def format_amount(amount):
     """Format amount with commas and currency symbol"""
-    return f"₹{amount:,.2f}"
+    # lru_cache treats -0.0 and 0.0 as one key, so key on the sign too to keep '₹-0.00' distinct
+    return format_signed_amount(amount, math.copysign(1.0, amount))
 
-def write_to_csv(results, output_dir):
-    """Write results to CSV files"""
+class DisbursementCsvWriter(AnalysisCsvWriter):
+    """Write disbursement results to CSV files one customer at a time"""
+    file_prefix = 'disbursement'
+    summary_header = ['Customer ID', 'Total Disbursed', 'Number of Loans', 'Average per Loan']
+    details_header = ['Customer ID', 'Loan Type', 'Amount', 'Date', 'Status']
     
-    # Create output directory if it doesn't exist
-    output_dir = Path(output_dir)
-    output_dir.mkdir(exist_ok=True)
-    
-    # Write summary CSV
-    summary_file = output_dir / 'disbursement_summary.csv'
-    with open(summary_file, 'w', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow(['Customer ID', 'Total Disbursed', 'Number of Loans', 'Average per Loan'])
+    def __init__(self, output_dir):
+        super().__init__(output_dir)
         
-        for result in results:
-            stats = result['stats']
-            total = stats['total_disbursed']
-            loan_count = stats['loan_count']
-            avg_per_loan = total / loan_count if loan_count > 0 else 0
-            
-            writer.writerow([
-                result['customer_id'],
-                format_amount(total),
-                loan_count,
-                format_amount(avg_per_loan)
-            ])
+        # Totals across customers for the per-customer averages
+        self.grand_total = 0
+        self.total_loans = 0
+        self.customer_count = 0
     
-    # Write detailed breakdown CSV
-    details_file = output_dir / 'disbursement_details.csv'
-    with open(details_file, 'w', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow(['Customer ID', 'Loan Type', 'Amount', 'Date', 'Status'])
+    def write(self, result):
+        customer_id = result['customer_id']
+        stats = result['stats']
+        total = stats['total_disbursed']
+        loan_count = stats['loan_count']
+        avg_per_loan = total / loan_count if loan_count > 0 else 0
         
-        for result in results:
-            customer_id = result['customer_id']
-            for loan in result['stats']['loan_details']:
-                writer.writerow([
-                    customer_id,
-                    loan['type'],
-                    format_amount(loan['amount']),
-                    loan['date'],
-                    loan['status']
-                ])
-    
-    # Write overall statistics CSV
-    stats_file = output_dir / 'disbursement_overall_stats.csv'
-    with open(stats_file, 'w', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow(['Metric', 'Value'])
+        self.grand_total += total
+        self.total_loans += loan_count
+        self.customer_count += 1
+        
+        self.summary_writer.writerow([
+            customer_id,
+            format_amount(total),
+            loan_count,
+            format_amount(avg_per_loan)
+        ])
         
-        grand_total = sum(r['stats']['total_disbursed'] for r in results)
-        total_loans = sum(r['stats']['loan_count'] for r in results)
-        avg_total = grand_total / len(results) if results else 0
-        avg_loans = total_loans / len(results) if results else 0
+        self.details_writer.writerows(
+            [
+                customer_id,
+                loan['type'],
+                format_amount(loan['amount']),
+                loan['date'],
+                loan['status']
+            ]
+            for loan in stats['loan_details']
+        )
+    
+    def overall_stats_rows(self):
+        customer_count = self.customer_count
+        avg_total = self.grand_total / customer_count if customer_count else 0
+        avg_loans = self.total_loans / customer_count if customer_count else 0
         
-        writer.writerow(['Total Disbursed Across All Customers', format_amount(grand_total)])
-        writer.writerow(['Average Disbursed per Customer', format_amount(avg_total)])
-        writer.writerow(['Average Number of Loans per Customer', f"{avg_loans:.2f}"])
+        return [
+            ['Total Disbursed Across All Customers', format_amount(self.grand_total)],
+            ['Average Disbursed per Customer', format_amount(avg_total)],
+            ['Average Number of Loans per Customer', f"{avg_loans:.2f}"]
+        ]
+
+write_to_csv = DisbursementCsvWriter.write_to_csv
 
 def main():
-    # Process all formatted reports
-    reports_dir = Path('formatted_reports')
-    results = []
-    
-    for report_file in reports_dir.glob('formatted_*.json'):
-        try:
-            # Extract customer ID from filename
-            customer_id = report_file.name.split('_')[1].split('.')[0]
-            
-            # Read the formatted report
-            with open(report_file, 'r') as f:
-                data = json.load(f)
-            
-            # Analyze disbursement statistics
-            stats = analyze_customer_disbursements(data)
-            
-            results.append({
-                'customer_id': customer_id,
-                'stats': stats
-            })
-            
-        except Exception as e:
-            print(f"Error processing {report_file}: {str(e)}")
+    # Process all formatted reports, streaming results straight to the CSV files
+    results = iter_results('formatted_reports', analyze_customer_disbursements)
     
     # Write results to CSV files
     write_to_csv(results, 'disbursement_analysis')
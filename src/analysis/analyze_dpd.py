@@ -1,46 +1,41 @@
 from pathlib import Path
-import json
-import csv
+import sys
 
-def parse_dpd_code(status):
-    """Convert status codes to DPD values"""
-    dpd_mapping = {
-        'XXX': '000',
-        'STD': '000',
-        'SUB': '091',
-        'DBT': '151',
-        'LSS': '181',
-        'SMA': '061',
-        'DDD': '000'
-    }
-    
-    # Split into DPD value and status code
-    dpd, code = status.split('/')
-    
-    # If DPD is a code, map it; otherwise use the numeric value
-    if dpd in dpd_mapping:
-        return int(dpd_mapping[dpd])
-    return int(dpd)
+if __name__ == "__main__":
+    # Run directly as a script: make the repository root importable for the src.* imports below
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from src.report_io import iter_results
+from src.analysis.csv_writer import AnalysisCsvWriter
+from src.analysis.dpd_months import DpdMonth, find_30plus_dpd, format_dpd_months
 
 def has_30plus_dpd(loan):
     """Check if a loan has any instance of 30+ DPD"""
-    dpd_months = []
-    for payment in loan['payment_history']:
-        dpd = parse_dpd_code(payment['status'])
-        if dpd >= 30:
-            dpd_months.append({
-                'date': payment['date'],
-                'dpd': dpd
-            })
-    return dpd_months
+    history = loan['payment_history']
+    codes = history['dpd']
+    
+    # Fail the analysis on months whose status could not be parsed during cleaning
+    if None in codes:
+        i = codes.index(None)
+        raise ValueError(f"Invalid payment status {history['status'][i]!r} for {history['date'][i]}")
+    
+    return [
+        DpdMonth(history['date'][i], codes[i])
+        for i in find_30plus_dpd(codes)
+    ]
 
-def analyze_customer_dpd(data):
-    """Analyze DPD statistics for a customer"""
+def analyze_customer_dpd(data, dpd_months_by_loan=None):
+    """Analyze DPD statistics for a customer.
+    
+    `dpd_months_by_loan` can carry each loan's has_30plus_dpd result when it was already computed.
+    """
     total_trades = len(data['loans'])
     loan_details = []
     
-    for loan in data['loans']:
-        dpd_months = has_30plus_dpd(loan)
+    if dpd_months_by_loan is None:
+        dpd_months_by_loan = [has_30plus_dpd(loan) for loan in data['loans']]
+    
+    for loan, dpd_months in zip(data['loans'], dpd_months_by_loan):
         loan_details.append({
             'type': loan['account_type'],
             'status': loan['status'],
@@ -58,88 +53,59 @@ def analyze_customer_dpd(data):
         'loan_details': loan_details
     }
 
-def write_to_csv(results, output_dir):
-    """Write results to CSV files"""
+class DpdCsvWriter(AnalysisCsvWriter):
+    """Write DPD results to CSV files one customer at a time"""
+    file_prefix = 'dpd'
+    summary_header = ['Customer ID', 'Total Trades', '30+ DPD Trades', 'Percentage']
+    details_header = ['Customer ID', 'Loan Type', 'Loan Status', 'Has 30+ DPD', 'DPD Months']
     
-    # Create output directory if it doesn't exist
-    output_dir = Path(output_dir)
-    output_dir.mkdir(exist_ok=True)
-    
-    # Write summary CSV
-    summary_file = output_dir / 'dpd_summary.csv'
-    with open(summary_file, 'w', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow(['Customer ID', 'Total Trades', '30+ DPD Trades', 'Percentage'])
+    def __init__(self, output_dir):
+        super().__init__(output_dir)
         
-        for result in results:
-            stats = result['stats']
-            writer.writerow([
-                result['customer_id'],
-                stats['total_trades'],
-                stats['trades_with_30plus_dpd'],
-                f"{stats['percentage']}%"
-            ])
+        # Running totals for the overall statistics
+        self.total_all_trades = 0
+        self.total_30plus_trades = 0
     
-    # Write detailed breakdown CSV
-    details_file = output_dir / 'dpd_details.csv'
-    with open(details_file, 'w', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow(['Customer ID', 'Loan Type', 'Loan Status', 'Has 30+ DPD', 'DPD Months'])
+    def write(self, result):
+        customer_id = result['customer_id']
+        stats = result['stats']
+        self.total_all_trades += stats['total_trades']
+        self.total_30plus_trades += stats['trades_with_30plus_dpd']
         
-        for result in results:
-            customer_id = result['customer_id']
-            for loan in result['stats']['loan_details']:
-                dpd_months_str = '; '.join([
-                    f"{month['date']}: {month['dpd']} days" 
-                    for month in loan['dpd_months']
-                ]) if loan['dpd_months'] else 'None'
-                
-                writer.writerow([
-                    customer_id,
-                    loan['type'],
-                    loan['status'],
-                    'Yes' if loan['has_30plus_dpd'] else 'No',
-                    dpd_months_str
-                ])
-    
-    # Write overall statistics CSV
-    stats_file = output_dir / 'dpd_overall_stats.csv'
-    with open(stats_file, 'w', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow(['Metric', 'Value'])
+        self.summary_writer.writerow([
+            customer_id,
+            stats['total_trades'],
+            stats['trades_with_30plus_dpd'],
+            f"{stats['percentage']}%"
+        ])
         
-        total_all_trades = sum(r['stats']['total_trades'] for r in results)
-        total_30plus_trades = sum(r['stats']['trades_with_30plus_dpd'] for r in results)
+        self.details_writer.writerows(
+            [
+                customer_id,
+                loan['type'],
+                loan['status'],
+                'Yes' if loan['has_30plus_dpd'] else 'No',
+                format_dpd_months(loan['dpd_months']) if loan['dpd_months'] else 'None'
+            ]
+            for loan in stats['loan_details']
+        )
+    
+    def overall_stats_rows(self):
+        total_all_trades = self.total_all_trades
+        total_30plus_trades = self.total_30plus_trades
         overall_percentage = (total_30plus_trades / total_all_trades * 100) if total_all_trades > 0 else 0
         
-        writer.writerow(['Total Trades', total_all_trades])
-        writer.writerow(['Trades with 30+ DPD', total_30plus_trades])
-        writer.writerow(['Overall Percentage', f"{round(overall_percentage, 2)}%"])
+        return [
+            ['Total Trades', total_all_trades],
+            ['Trades with 30+ DPD', total_30plus_trades],
+            ['Overall Percentage', f"{round(overall_percentage, 2)}%"]
+        ]
+
+write_to_csv = DpdCsvWriter.write_to_csv
 
 def main():
-    # Process all formatted reports
-    reports_dir = Path('formatted_reports')
-    results = []
-    
-    for report_file in reports_dir.glob('formatted_*.json'):
-        try:
-            # Extract customer ID from filename
-            customer_id = report_file.name.split('_')[1].split('.')[0]
-            
-            # Read the formatted report
-            with open(report_file, 'r') as f:
-                data = json.load(f)
-            
-            # Analyze DPD statistics
-            stats = analyze_customer_dpd(data)
-            
-            results.append({
-                'customer_id': customer_id,
-                'stats': stats
-            })
-            
-        except Exception as e:
-            print(f"Error processing {report_file}: {str(e)}")
+    # Process all formatted reports, streaming results straight to the CSV files
+    results = iter_results('formatted_reports', analyze_customer_dpd)
     
     # Write results to CSV files
     write_to_csv(results, 'dpd_analysis')
@@ -0,0 +1,60 @@
+from pathlib import Path
+import csv
+
+class AnalysisCsvWriter:
+    """Stream one analysis' results into its summary, details and overall statistics CSV files.
+    
+    Subclasses set `file_prefix` and the two headers, write one customer's rows in `write`
+    and return the overall statistics rows from `overall_stats_rows`.
+    """
+    file_prefix = None
+    summary_header = None
+    details_header = None
+    
+    def __init__(self, output_dir):
+        # Create output directory if it doesn't exist
+        output_dir = Path(output_dir)
+        output_dir.mkdir(exist_ok=True)
+        
+        self.stats_file = output_dir / f'{self.file_prefix}_overall_stats.csv'
+        self.summary_f = open(output_dir / f'{self.file_prefix}_summary.csv', 'w', newline='')
+        self.details_f = open(output_dir / f'{self.file_prefix}_details.csv', 'w', newline='')
+        self.summary_writer = csv.writer(self.summary_f)
+        self.details_writer = csv.writer(self.details_f)
+        self.summary_writer.writerow(self.summary_header)
+        self.details_writer.writerow(self.details_header)
+    
+    def write(self, result):
+        """Write the summary and detail rows for one customer's result"""
+        raise NotImplementedError
+    
+    def overall_stats_rows(self):
+        """Return the metric rows of the overall statistics CSV"""
+        raise NotImplementedError
+    
+    def close(self, finalize=True):
+        """Close the summary and details CSVs, then write the overall statistics CSV if `finalize`"""
+        self.summary_f.close()
+        self.details_f.close()
+        if not finalize:
+            return
+        
+        # Write overall statistics CSV
+        with open(self.stats_file, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['Metric', 'Value'])
+            writer.writerows(self.overall_stats_rows())
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Leave out the overall statistics when writing stopped on an error
+        self.close(finalize=exc_type is None)
+    
+    @classmethod
+    def write_to_csv(cls, results, output_dir):
+        """Write results to CSV files in a single pass, so `results` may be any iterable"""
+        with cls(output_dir) as writer:
+            for result in results:
+                writer.write(result)
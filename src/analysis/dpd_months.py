@@ -0,0 +1,16 @@
+from collections import namedtuple
+
+# A single month with 30+ DPD; lighter than a dict per month
+DpdMonth = namedtuple('DpdMonth', ['date', 'dpd'])
+
+def find_30plus_dpd(codes):
+    """Return the positions of the months with 30+ DPD in a list of DPD values"""
+    # Most loans are clean, so skip the scan when even the worst month is under 30 DPD
+    if not codes or max(codes) < 30:
+        return []
+    
+    return [i for i, dpd in enumerate(codes) if dpd >= 30]
+
+def format_dpd_months(dpd_months):
+    """Format 30+ DPD months as '<date>: <dpd> days' entries joined by '; '"""
+    return '; '.join([f"{month.date}: {month.dpd} days" for month in dpd_months])
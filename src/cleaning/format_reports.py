@@ -1,58 +1,97 @@
 import xml.etree.ElementTree as ET
-import json
+import mmap
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 from pathlib import Path
+import sys
+
+if __name__ == "__main__":
+    # Run directly as a script: make the repository root importable for the src.* imports below
+    sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from src.report_io import dump_report
+from src.dpd_codes import parse_dpd_code
+
+# One "date,status" entry of a '|'-separated combined payment history
+PAYMENT_HISTORY_RE = re.compile(r'(?:^|\|)([^,|]*),([^,|]*)(?=\||$)')
+
+# Element path of each loan record below the report root
+RESPONSE_PATH = ['INDV-REPORTS', 'INDV-REPORT', 'RESPONSES', 'RESPONSE']
 
 def xml_to_dict(element):
     """Convert XML to dictionary."""
-    result = {}
-    
-    # Handle attributes if present
-    if element.attrib:
-        result.update(element.attrib)
-    
-    # Handle child elements
-    for child in element:
-        child_data = xml_to_dict(child)
+    # Collect every element parent-first with an explicit stack instead of recursing
+    order = []
+    stack = deque([element])
+    while stack:
+        node = stack.pop()
+        order.append(node)
+        stack.extend(node)
+    
+    # Convert children before their parents by walking the elements in reverse
+    converted = {}
+    for node in reversed(order):
+        text = node.text.strip() if node.text else ''
         
-        # Handle case where tag already exists
-        if child.tag in result:
-            # If it's not already a list, convert to list
-            if not isinstance(result[child.tag], list):
-                result[child.tag] = [result[child.tag]]
-            result[child.tag].append(child_data)
-        else:
-            result[child.tag] = child_data
-    
-    # Handle text content
-    if element.text and element.text.strip():
-        if not result:  # If no children or attributes
-            return element.text.strip()
-        else:
-            result['text'] = element.text.strip()
-    
-    return result
+        # Leaf elements without attributes, the bulk of a report, are just their text
+        if not node.attrib and len(node) == 0:
+            converted[node] = text if text else {}
+            continue
+        
+        # Handle attributes if present
+        result = dict(node.attrib)
+        
+        # Group child values by tag; repeated tags become a list
+        children = {}
+        for child in node:
+            values = children.get(child.tag)
+            if values is None:
+                # An attribute named like the tag is merged in ahead of the children
+                values = children[child.tag] = [result[child.tag]] if child.tag in result else []
+            values.append(converted.pop(child))
+        for tag, values in children.items():
+            result[tag] = values[0] if len(values) == 1 else values
+        
+        # Handle text content
+        if text:
+            if not result:  # If no children or attributes
+                converted[node] = text
+                continue
+            result['text'] = text
+        
+        converted[node] = result
+    
+    return converted[element]
 
 def parse_payment_history(history_str):
-    """Parse the combined payment history string into a list of monthly records"""
-    if not history_str:
-        return []
-    
-    entries = history_str.split("|")
-    parsed = []
-    
-    for entry in entries:
-        if not entry.strip():
-            continue
-        try:
-            date, status = entry.split(",")
-            parsed.append({
-                "date": date,
-                "status": status
-            })
-        except ValueError:
-            continue
-            
-    return parsed
+    """Parse the combined payment history string into columns of monthly dates, statuses and DPD values.
+    
+    Months whose status cannot be converted to a DPD value get None in the DPD column.
+    """
+    dates = []
+    statuses = []
+    dpds = []
+    
+    if history_str:
+        # Entries that are blank or don't hold exactly one date and status never match
+        for date, status in PAYMENT_HISTORY_RE.findall(history_str):
+            try:
+                dpd = parse_dpd_code(status)
+            except ValueError:
+                # Keep the month with no DPD value so the analysis reports it rather than undercounting
+                dpd = None
+            dates.append(date)
+            statuses.append(status)
+            dpds.append(dpd)
+    
+    return {
+        "date": dates,
+        "status": statuses,
+        "dpd": dpds
+    }
 
 def format_loan_details(loan):
     """Format a single loan's details into a readable structure"""
@@ -71,8 +110,32 @@ def format_loan_details(loan):
     
     return formatted
 
-def analyze_credit_report(xml_data):
-    """Convert XML to JSON and analyze the credit report in one step"""
+def stream_credit_report(source):
+    """Parse a credit report XML, formatting each loan as soon as its RESPONSE element is read"""
+    root = None
+    path = []
+    loans = []
+    
+    for event, elem in ET.iterparse(source, events=('start', 'end')):
+        if event == 'start':
+            if root is None:
+                root = elem
+            path.append(elem.tag)
+            continue
+        
+        if elem.tag == 'RESPONSE' and path[1:] == RESPONSE_PATH:
+            loans.append(format_loan_details(xml_to_dict(elem)))
+            # Release the loan subtree once it has been formatted
+            elem.clear()
+        path.pop()
+    
+    return root, loans
+
+def analyze_credit_report(xml_data, loans=None):
+    """Convert XML to JSON and analyze the credit report in one step.
+    
+    Loans already formatted while streaming the XML can be passed in via `loans`.
+    """
     # Convert XML to dictionary
     data = xml_to_dict(xml_data)
     
@@ -105,6 +168,10 @@ def analyze_credit_report(xml_data):
         "loans": []
     }
     
+    if loans is not None:
+        analysis["loans"] = loans
+        return analysis
+    
     # Process each loan
     responses = report.get("RESPONSES", {}).get("RESPONSE", [])
     if not isinstance(responses, list):
@@ -117,39 +184,43 @@ def analyze_credit_report(xml_data):
     return analysis
 
 def process_credit_report(xml_file, output_dir):
-    """Process a single credit report from XML to formatted JSON"""
+    """Process a single credit report from XML to formatted JSON.
+    
+    Returns the output file (None on failure) and the text to print for the report, so that
+    reports processed in parallel are printed whole by the caller.
+    """
     try:
-        # Parse XML
-        tree = ET.parse(xml_file)
-        root = tree.getroot()
+        # Parse XML from a memory-mapped file, formatting loans while streaming through it
+        with open(xml_file, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            root, loans = stream_credit_report(mm)
         
         # Analyze the report directly from XML
-        analysis = analyze_credit_report(root)
+        analysis = analyze_credit_report(root, loans)
         
         # Create output filename
         output_file = output_dir / f"formatted_{xml_file.stem}.json"
         
         # Write formatted output
-        with open(output_file, 'w') as f:
-            json.dump(analysis, f, indent=2)
+        dump_report(analysis, output_file)
         
-        # Print key insights
-        print(f"\nCredit Report Summary for {xml_file.name}:")
-        print("-" * 50)
-        print(f"Report Date: {analysis['report_date']}")
-        print(f"Credit Score: {analysis['credit_score']['value']} ({analysis['credit_score']['comments']})")
-        print(f"Total Accounts: {analysis['summary']['total_accounts']}")
-        print(f"Active Accounts: {analysis['summary']['active_accounts']}")
-        print(f"Credit History: {analysis['summary']['credit_history_years']} years")
-        print(f"Recent Inquiries: {analysis['summary']['recent_inquiries']}")
-        print(f"Current Total Balance: ₹{analysis['summary']['total_balance']}")
-        print()
+        # Key insights
+        summary = "\n".join([
+            f"\nCredit Report Summary for {xml_file.name}:",
+            "-" * 50,
+            f"Report Date: {analysis['report_date']}",
+            f"Credit Score: {analysis['credit_score']['value']} ({analysis['credit_score']['comments']})",
+            f"Total Accounts: {analysis['summary']['total_accounts']}",
+            f"Active Accounts: {analysis['summary']['active_accounts']}",
+            f"Credit History: {analysis['summary']['credit_history_years']} years",
+            f"Recent Inquiries: {analysis['summary']['recent_inquiries']}",
+            f"Current Total Balance: ₹{analysis['summary']['total_balance']}",
+            ""
+        ])
         
-        return output_file
+        return output_file, summary
         
     except Exception as e:
-        print(f"Error processing {xml_file}: {str(e)}")
-        return None
+        return None, f"Error processing {xml_file}: {str(e)}"
 
 def clean_credit_reports(input_dir='data/raw_files/xml', output_dir='data/interim'):
     """Process all credit reports in the input directory"""
@@ -157,12 +228,17 @@ def clean_credit_reports(input_dir='data/raw_files/xml', output_dir='data/interi
     output_dir = Path(output_dir)
     output_dir.mkdir(parents=True, exist_ok=True)
     
+    # Largest reports first, so a big file does not start last and hold up the pool
+    xml_files = sorted(input_dir.glob('*.xml'), key=lambda p: p.stat().st_size, reverse=True)
     processed_files = []
     
-    for xml_file in input_dir.glob('*.xml'):
-        output_file = process_credit_report(xml_file, output_dir)
-        if output_file:
-            processed_files.append(output_file)
+    # Reports are independent, so convert them in parallel
+    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+        for output_file, message in executor.map(process_credit_report, xml_files, repeat(output_dir)):
+            # Print from the parent so each report's summary stays in one piece
+            print(message)
+            if output_file:
+                processed_files.append(output_file)
     
     return processed_files
 
@@ -0,0 +1,21 @@
+# Status codes that stand in for a DPD value, mapped straight to ints
+DPD_MAPPING = {
+    'XXX': 0,
+    'STD': 0,
+    'SUB': 91,
+    'DBT': 151,
+    'LSS': 181,
+    'SMA': 61,
+    'DDD': 0
+}
+
+def parse_dpd_code(status):
+    """Convert status codes to DPD values"""
+    # Split into DPD value and status code; anything but exactly one '/' is malformed
+    dpd, sep, code = status.partition('/')
+    if not sep or '/' in code:
+        raise ValueError(f"Invalid DPD status: {status!r}")
+    
+    # If DPD is a code, map it; otherwise use the numeric value
+    value = DPD_MAPPING.get(dpd)
+    return value if value is not None else int(dpd)
@@ -0,0 +1,47 @@
+from pathlib import Path
+import json
+
+try:
+    import orjson
+except ImportError:
+    # orjson is optional; fall back to the standard library parser
+    orjson = None
+
+def load_report(report_file):
+    """Read a formatted report JSON file into a dictionary"""
+    report_file = Path(report_file)
+    if orjson is not None:
+        return orjson.loads(report_file.read_bytes())
+    
+    with open(report_file, 'r') as f:
+        return json.load(f)
+
+def dump_report(data, output_file):
+    """Write a formatted report dictionary to a compact JSON file"""
+    # Formatted reports are only read back by the pipeline, so skip indentation
+    output_file = Path(output_file)
+    if orjson is not None:
+        output_file.write_bytes(orjson.dumps(data))
+        return
+    
+    with open(output_file, 'w') as f:
+        json.dump(data, f, separators=(',', ':'))
+
+def iter_results(reports_dir, analyze):
+    """Yield `analyze`'s result for each formatted report in a directory, one customer at a time"""
+    for report_file in Path(reports_dir).glob('formatted_*.json'):
+        try:
+            # Extract customer ID from filename
+            customer_id = report_file.name.split('_')[1].split('.')[0]
+            
+            # Read and analyze the formatted report
+            stats = analyze(load_report(report_file))
+            
+        except Exception as e:
+            print(f"Error processing {report_file}: {str(e)}")
+            continue
+        
+        yield {
+            'customer_id': customer_id,
+            'stats': stats
+        }